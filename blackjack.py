@@ -1,33 +1,107 @@
 from random import shuffle
 
+from collections import namedtuple
 from enum import Enum, unique
+from itertools import islice
 
 
+# The dealer keeps hitting until their hand is worth at least this many points.
+DEALER_STANDS_ON = 17
+
+
+def _total(aces, non_ace):
+    # Count every ace as 11 up front, then demote aces to 1 while the hand is over 21.
+    total = non_ace + aces * 11
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total
+
 def sum_cards(cards):
-    total = 0
-    for card in reversed(sorted(cards, key=lambda c: c.value)):
-        if card.type == Card.CardType.ACE:
-            if total > 10:
-                total += 1
-            else:
-                total += 11
+    return sum_ranks(card.rank for card in cards)
+
+def sum_ranks(ranks):
+    """
+    Sums a hand given as integer card ranks (see `Card.rank`).
+    """
+    aces = 0
+    non_ace = 0
+    for rank in ranks:
+        if rank == ACE_RANK:
+            aces += 1
         else:
-            total += card.value
-    return total
+            non_ace += RANK_VALUES[rank]
+    return _total(aces, non_ace)
 
-def is_hand_blackjack(hand):
-    if len(hand) > 2:
-        return False
-    if Card.CardType.ACE in hand and (Card.CardType.TEN in hand or
-                                      Card.CardType.KING in hand or
-                                      Card.CardType.QUEEN in hand or
-                                      Card.CardType.JACK in hand):
-        return True
-    return False
+def sum_many_hands(hands):
+    """
+    Sums a batch of hands, each given as a sequence of card ranks. Returns a list of totals.
+    """
+    return list(map(sum_ranks, hands))
+
+
+# Terminal dealer totals reported by `dealer_terminal_distribution`, in order. None stands for BUST.
+DEALER_OUTCOMES = tuple(range(DEALER_STANDS_ON, 22)) + (None,)
+# Maps (upcard value bucket, remaining counts per value bucket) -> outcome probabilities.
+_DEALER_CACHE = {}
+
+def dealer_terminal_distribution(upcard_rank, deck_counts):
+    """
+    Returns the probability of each of `DEALER_OUTCOMES` for a dealer showing `upcard_rank` whose
+    hole card and hits are drawn from a shoe holding `deck_counts[rank]` cards of each rank.
+    The dealer hits below `DEALER_STANDS_ON`, as in `BlackJack`.
+
+    Results are cached by deck composition. Ranks with equal values (TEN, KING, QUEEN, JACK) are
+    interchangeable for the dealer, so compositions are keyed by counts per value.
+    """
+    counts = [0] * 10
+    for rank, count in enumerate(deck_counts):
+        counts[RANK_VALUES[rank] - 1] += count
+    key = (RANK_VALUES[upcard_rank], tuple(counts))
+    try:
+        return _DEALER_CACHE[key]
+    except KeyError:
+        pass
+    if upcard_rank == ACE_RANK:
+        aces, non_ace = 1, 0
+    else:
+        aces, non_ace = 0, RANK_VALUES[upcard_rank]
+    distribution = tuple(_dealer_outcomes(aces, non_ace, counts, sum(counts)))
+    _DEALER_CACHE[key] = distribution
+    return distribution
+
+def _dealer_outcomes(aces, non_ace, counts, remaining):
+    total = _total(aces, non_ace)
+    if total > 21:
+        distribution = [0.0] * len(DEALER_OUTCOMES)
+        distribution[-1] = 1.0
+        return distribution
+    if total >= DEALER_STANDS_ON:
+        distribution = [0.0] * len(DEALER_OUTCOMES)
+        distribution[total - DEALER_STANDS_ON] = 1.0
+        return distribution
+    if not remaining:
+        raise ValueError("Not enough cards left in the deck for the dealer to finish.")
+    distribution = [0.0] * len(DEALER_OUTCOMES)
+    for value_index, count in enumerate(counts):
+        if not count:
+            continue
+        counts[value_index] -= 1
+        if value_index == 0:
+            outcomes = _dealer_outcomes(aces + 1, non_ace, counts, remaining - 1)
+        else:
+            outcomes = _dealer_outcomes(aces, non_ace + value_index + 1, counts, remaining - 1)
+        counts[value_index] += 1
+        p = count / remaining
+        for i, outcome in enumerate(outcomes):
+            distribution[i] += p * outcome
+    return distribution
 
 
 class Card:
 
+    __slots__ = ('type', 'value', 'rank')
+
     @unique
     class CardType(Enum):
         ACE='ACE'
@@ -44,12 +118,19 @@ class Card:
         QUEEN='QUEEN'
         JACK='JACK'
 
+    # Integer rank of each card type: 0 for ACE up to 12 for JACK, in declaration order.
+    RANKS = {card_type: rank for rank, card_type in enumerate(CardType)}
+
     def __init__(self, card_type, value):
+        rank = Card.RANKS[card_type]
+        if value != RANK_VALUES[rank]:
+            raise ValueError(f"A {card_type.value} card is worth {RANK_VALUES[rank]}, got {value}")
         self.type = card_type
         self.value = value
+        self.rank = rank
 
     def __str__(self):
-        return f'{self.type.value}'
+        return _RANK_NAMES[self.rank]
 
     def __repr__(self):
         return str(self)
@@ -58,26 +139,117 @@ class Card:
         return self.type == other.type
 
 
+ACE_RANK = Card.RANKS[Card.CardType.ACE]
+# Point value of each card rank, indexed by `Card.rank`.
+RANK_VALUES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)
+# Display name of each card rank, indexed by `Card.rank`.
+_RANK_NAMES = tuple(card_type.value for card_type in Card.CardType)
+
+# Bitmasks over card ranks (bit `Card.rank` set) used to spot a blackjack in a 2-card hand.
+_ACE_BIT = 1 << ACE_RANK
+_TEN_FACES_MASK = sum(1 << Card.RANKS[card_type] for card_type in (Card.CardType.TEN, Card.CardType.KING,
+                                                                   Card.CardType.QUEEN, Card.CardType.JACK))
+
+# (aces, non-ace points) that a card of each rank adds to a hand, indexed by `Card.rank`.
+_RANK_SPLITS = tuple((1, 0) if rank == ACE_RANK else (0, value) for rank, value in enumerate(RANK_VALUES))
+
+
+def _is_blackjack_ranks(first, second):
+    mask = (1 << first) | (1 << second)
+    return bool(mask & _ACE_BIT) and bool(mask & _TEN_FACES_MASK)
+
+def is_hand_blackjack(hand):
+    if len(hand) != 2:
+        return False
+    return _is_blackjack_ranks(hand[0].rank, hand[1].rank)
+
+
+# Result of a tie on points, keyed by (player has blackjack, dealer has blackjack).
+_TIE_RESULTS = {(True, True): 'PUSH',
+                (True, False): 'WON',
+                (False, True): 'LOST',
+                # Non-blackjack hands equaling the same points
+                (False, False): 'PUSH'}
+
+def _hand_result(player_total, dealer_total, player_blackjack, dealer_blackjack):
+    if player_total > 21:
+        return 'BUST'
+    if dealer_total > 21 or player_total > dealer_total:
+        return 'WON'
+    if dealer_total > player_total:
+        return 'LOST'
+    return _TIE_RESULTS[player_blackjack, dealer_blackjack]
+
+
+# Snapshot of a player's or the dealer's hand. `bust` is kept alongside `total` for convenience.
+PlayerState = namedtuple('PlayerState', 'name hand bust total')
+
+
+class GameState(namedtuple('GameState', 'finished current_player players dealer')):
+    """
+    Snapshot of a game. `players` maps each player's name to their `PlayerState`.
+    """
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """
+        Returns the state as the nested dicts `BlackJack.get_game_state()` used to return.
+        """
+        return {'finished': self.finished,
+                'current_player': self.current_player,
+                'players': {name: {'hand': p.hand, 'bust': p.bust} for name, p in self.players.items()},
+                'dealer': {'hand': self.dealer.hand, 'bust': self.dealer.bust}}
+
+
 class Player:
     """
     Represents a player or dealer. Keeps track of the player's hand.
     """
 
+    __slots__ = ('name', 'hand', 'aces', 'non_ace', '_blackjack')
+
     def __init__(self, name):
         self.name = name
         self.hand = []
+        # Running ace count and sum of the non-ace cards, so the hand total is O(1).
+        self.aces = 0
+        self.non_ace = 0
+        # A hand can only be a blackjack right after the initial deal, so this is set once there.
+        self._blackjack = False
 
     def deal_initial_cards(self, card1, card2):
         if self.hand:
             raise Exception("Cannot deal initial cards when player's hand is not empty")
-        self.hand.append(card1)
-        self.hand.append(card2)
+        self.hit(card1)
+        self.hit(card2)
+        self._blackjack = is_hand_blackjack(self.hand)
 
     def hit(self, card):
         self.hand.append(card)
+        self._blackjack = False
+        # Values come from RANK_VALUES, like sum_cards(), so both always agree on a hand's total.
+        aces, non_ace = _RANK_SPLITS[card.rank]
+        self.aces += aces
+        self.non_ace += non_ace
+
+    @property
+    def is_blackjack(self):
+        return self._blackjack
+
+    def hand_total(self):
+        return _total(self.aces, self.non_ace)
 
     def is_bust(self):
-        return sum_cards(self.hand) > 21
+        return self.hand_total() > 21
+
+    def get_state(self):
+        total = self.hand_total()
+        return PlayerState(self.name, self.hand, total > 21, total)
+
+
+# One card of each type. Cards are never mutated, so decks share these instances.
+_DECK_TEMPLATE = tuple(Card(card_type, value) for card_type, value in zip(Card.CardType, RANK_VALUES))
 
 
 class Deck:
@@ -85,24 +257,63 @@ class Deck:
     Represents a deck of cards. Initializes to a shuffled deck.
     """
 
-    def __init__(self, num_decks=2):
-        self.cards = [Card(Card.CardType.ACE, 1),
-                      Card(Card.CardType.TWO, 2),
-                      Card(Card.CardType.THREE, 3),
-                      Card(Card.CardType.FOUR, 4),
-                      Card(Card.CardType.FIVE, 5),
-                      Card(Card.CardType.SIX, 6),
-                      Card(Card.CardType.SEVEN, 7),
-                      Card(Card.CardType.EIGHT, 8),
-                      Card(Card.CardType.NINE, 9),
-                      Card(Card.CardType.TEN, 10),
-                      Card(Card.CardType.KING, 10),
-                      Card(Card.CardType.QUEEN, 10),
-                      Card(Card.CardType.JACK, 10)] * num_decks
-        shuffle(self.cards)
+    def __init__(self, num_decks=2, cards=None):
+        """
+        :param cards: If given, the deck uses these cards as-is (drawn from the end) instead of
+                      building and shuffling `num_decks` fresh decks.
+        """
+        if cards is not None:
+            self.cards = cards
+        else:
+            self.cards = list(_DECK_TEMPLATE) * num_decks
+            shuffle(self._cards)
+
+    @property
+    def cards(self):
+        """
+        The cards still in the deck, as a new list. The last card is the next one drawn.
+        """
+        return self._cards[:self._top]
+
+    @cards.setter
+    def cards(self, cards):
+        # Cards are drawn from the end of `self._cards` by moving this cursor down; the list itself
+        # is never resized, so it still holds drawn cards. Only `self._cards[:self._top]` are
+        # still in the deck.
+        self._cards = list(cards)
+        self._top = len(self._cards)
+
+    def __len__(self):
+        return self._top
 
     def draw_card(self):
-        return self.cards.pop()
+        if not self._top:
+            raise IndexError('Cannot draw from an empty deck')
+        self._top -= 1
+        return self._cards[self._top]
+
+    def draw_cards(self, n):
+        """
+        Draws `n` cards at once. Returns them in the order repeated `draw_card()` calls would.
+        """
+        if n < 0:
+            raise ValueError(f'Cannot draw a negative number of cards, got {n}')
+        top = self._top
+        if n > top:
+            raise IndexError(f'Cannot draw {n} cards from a deck of {top}')
+        self._top = top - n
+        cards = self._cards[top - n:top]
+        cards.reverse()
+        return cards
+
+    def rank_counts(self):
+        """
+        Returns the number of cards of each rank left in the deck, indexed by `Card.rank`.
+        """
+        counts = [0] * len(RANK_VALUES)
+        for card in islice(self._cards, self._top):
+            counts[card.rank] += 1
+        return tuple(counts)
 
 
 class BlackJack:
@@ -145,11 +356,13 @@ class BlackJack:
             self._deck = Deck(num_decks=2)
         else:
             self._deck = deck
-        # When this is None, it means the game has ended.
+        # When these are None, it means the game has ended.
+        self._current_index = 0
         self._current_player = self._players[0]
 
-        for player in self._players + [self._dealer]:
+        for player in self._players:
             player.deal_initial_cards(self._deck.draw_card(), self._deck.draw_card())
+        self._dealer.deal_initial_cards(self._deck.draw_card(), self._deck.draw_card())
 
     def get_current_player_name(self):
         assert self._current_player is not None, "Game has ended."
@@ -167,83 +380,106 @@ class BlackJack:
 
     def _next_player(self):
         assert self._current_player is not None, "Game has ended."
-        curr_player_index = self._players.index(self._current_player)
+        curr_player_index = self._current_index
         if curr_player_index == len(self._players) - 1:
             self._play_dealers_turn()
+            self._current_index = None
             self._current_player = None
         else:
+            self._current_index = curr_player_index + 1
             self._current_player = self._players[curr_player_index + 1]
 
     def game_finished(self):
         return self._current_player is None
 
     def _play_dealers_turn(self):
-        while sum_cards(self._dealer.hand) < 17:
-            self._dealer.hit(self._deck.draw_card())
+        dealer = self._dealer
+        draw_card = self._deck.draw_card
+        while dealer.hand_total() < DEALER_STANDS_ON:
+            dealer.hit(draw_card())
 
     def get_game_state(self):
-        state = {'finished': self.game_finished(),
-                 'current_player': None if self.game_finished() else self._current_player.name,
-                 'players': {p.name: {'hand': p.hand,
-                                      'bust': p.is_bust()}
-                             for p in self._players},
-                 'dealer': {'hand': self._dealer.hand,
-                            'bust': self._dealer.is_bust()}}
-        return state
-
-    def _player_str(self, name, hand, is_bust):
-        cards_str = ', '.join(str(c) for c in hand)
-        player_str = f"{name} ({'BUST' if is_bust else sum_cards(hand)}):\n\t{cards_str}"
+        finished = self.game_finished()
+        return GameState(finished=finished,
+                         current_player=None if finished else self._current_player.name,
+                         players={p.name: p.get_state() for p in self._players},
+                         dealer=self._dealer.get_state())
+
+    def _player_str(self, player):
+        cards_str = ', '.join(_RANK_NAMES[c.rank] for c in player.hand)
+        hand_sum = player.hand_total()
+        player_str = f"{player.name} ({'BUST' if hand_sum > 21 else hand_sum}):\n\t{cards_str}"
         return player_str
 
-    def _dealer_str(self, hand, is_bust, show_hole=True):
-        cards_str = ', '.join(str(c) for c in self._dealer.hand) if show_hole else f"{self._dealer.hand[0]}, X"
-        dealer_str = f"Dealer ({'BUST' if self._dealer.is_bust() else sum_cards(self._dealer.hand) if show_hole else 'X'}):\n\t{cards_str}"
+    def _dealer_str(self, show_hole=True):
+        hand = self._dealer.hand
+        cards_str = ', '.join(_RANK_NAMES[c.rank] for c in hand) if show_hole else f"{_RANK_NAMES[hand[0].rank]}, X"
+        hand_sum = self._dealer.hand_total()
+        dealer_str = f"Dealer ({'BUST' if hand_sum > 21 else hand_sum if show_hole else 'X'}):\n\t{cards_str}"
         return dealer_str
 
     def get_game_state_str(self, show_hole=True):
-        state = self.get_game_state()
-        player_strings = [self._player_str(name, p_state['hand'], p_state['bust'])
-                          for name, p_state in state['players'].items()]
-        dealer = state['dealer']
-        player_strings.append(self._dealer_str(dealer['hand'], dealer['bust'], show_hole))
+        player_strings = [self._player_str(p) for p in self._players]
+        player_strings.append(self._dealer_str(show_hole))
         return '\n\n'.join(player_strings)
 
     def get_game_result(self):
         assert self._current_player is None, "Game has not ended yet."
-        player_results = {}
-        for player in self._players:
-            result = None
-            if player.is_bust():
-                result = 'BUST'
-            elif self._dealer.is_bust():
-                result = 'WON'
-            else:
-                player_hand_sum = sum_cards(player.hand)
-                dealer_hand_sum = sum_cards(self._dealer.hand)
-                if player_hand_sum > dealer_hand_sum:
-                    result = 'WON'
-                elif dealer_hand_sum > player_hand_sum:
-                    result = 'LOST'
-                else:
-                    if is_hand_blackjack(player.hand) and is_hand_blackjack(self._dealer.hand):
-                        result = 'PUSH'
-                    elif is_hand_blackjack(player.hand):
-                        result = 'WON'
-                    elif is_hand_blackjack(self._dealer.hand):
-                        result = 'LOST'
-                    else:
-                        # Non-blackjack hands equaling the same points
-                        result = 'PUSH'
-            assert result is not None
-            player_results[player.name] = result
-        return player_results
+        dealer = self._dealer
+        dealer_hand_sum = dealer.hand_total()
+        return {player.name: _hand_result(player.hand_total(), dealer_hand_sum,
+                                          player.is_blackjack, dealer.is_blackjack)
+                for player in self._players}
 
     def get_game_result_str(self):
         player_results = self.get_game_result()
         return "\n".join(f'{name}: {result}' for name, result in player_results.items())
 
 
+def simulate_games(n, num_players=1, num_decks=2, player_stands_on=DEALER_STANDS_ON):
+    """
+    Plays `n` games with the same rules and dealing order as `BlackJack`, without building any
+    game, player or card objects. Every player hits until reaching `player_stands_on` points.
+    Each game uses a freshly shuffled deck of `num_decks` decks. Like `Deck.draw_card`, raises
+    IndexError if a game runs out of cards.
+
+    Returns a dict mapping each result ('WON', 'LOST', 'PUSH', 'BUST') to how many player hands
+    ended with it, over all players and games.
+    """
+    results = dict.fromkeys(('WON', 'LOST', 'PUSH', 'BUST'), 0)
+    ranks = [card.rank for card in _DECK_TEMPLATE] * num_decks
+    for _ in range(n):
+        shuffle(ranks)
+        top = len(ranks)
+        # (aces, non-ace sum, is blackjack) per hand; the dealer's hand is last.
+        hands = []
+        for _ in range(num_players + 1):
+            if top < 2:
+                raise IndexError('Cannot draw from an empty deck')
+            first, second = ranks[top - 1], ranks[top - 2]
+            top -= 2
+            first_aces, first_non_ace = _RANK_SPLITS[first]
+            second_aces, second_non_ace = _RANK_SPLITS[second]
+            hands.append([first_aces + second_aces, first_non_ace + second_non_ace,
+                          _is_blackjack_ranks(first, second)])
+        for i, hand in enumerate(hands):
+            stands_on = DEALER_STANDS_ON if i == num_players else player_stands_on
+            aces, non_ace, _ = hand
+            while _total(aces, non_ace) < stands_on:
+                if not top:
+                    raise IndexError('Cannot draw from an empty deck')
+                top -= 1
+                rank_aces, rank_non_ace = _RANK_SPLITS[ranks[top]]
+                aces += rank_aces
+                non_ace += rank_non_ace
+            hand[0], hand[1] = aces, non_ace
+        dealer_aces, dealer_non_ace, dealer_blackjack = hands.pop()
+        dealer_total = _total(dealer_aces, dealer_non_ace)
+        for aces, non_ace, blackjack in hands:
+            results[_hand_result(_total(aces, non_ace), dealer_total, blackjack, dealer_blackjack)] += 1
+    return results
+
+
 def play_blackjack():
     players = []
     while True:
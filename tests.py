@@ -1,7 +1,25 @@
+import random
 from unittest import TestCase, main
 from pprint import pformat
 
-from blackjack import BlackJack, Deck, Card
+from blackjack import BlackJack, Deck, Card, sum_many_hands, dealer_terminal_distribution, simulate_games
+
+
+CODE_TO_CARD = {
+    'a': Card(Card.CardType.ACE, 1),
+    '2': Card(Card.CardType.TWO, 2),
+    '3': Card(Card.CardType.THREE, 3),
+    '4': Card(Card.CardType.FOUR, 4),
+    '5': Card(Card.CardType.FIVE, 5),
+    '6': Card(Card.CardType.SIX, 6),
+    '7': Card(Card.CardType.SEVEN, 7),
+    '8': Card(Card.CardType.EIGHT, 8),
+    '9': Card(Card.CardType.NINE, 9),
+    '10': Card(Card.CardType.TEN, 10),
+    'k': Card(Card.CardType.KING, 10),
+    'q': Card(Card.CardType.QUEEN, 10),
+    'j': Card(Card.CardType.JACK, 10),
+}
 
 
 def make_card(code):
@@ -9,25 +27,11 @@ def make_card(code):
     Returns a Card object for a card code.
     Choices are: a, 2, 3, 4, 5, 6, 7, 8, 9, 10, k, q, j
     """
-    CODE_TO_CARD = {
-        'a': Card(Card.CardType.ACE, 1),
-        '2': Card(Card.CardType.TWO, 2),
-        '3': Card(Card.CardType.THREE, 3),
-        '4': Card(Card.CardType.FOUR, 4),
-        '5': Card(Card.CardType.FIVE, 5),
-        '6': Card(Card.CardType.SIX, 6),
-        '7': Card(Card.CardType.SEVEN, 7),
-        '8': Card(Card.CardType.EIGHT, 8),
-        '9': Card(Card.CardType.NINE, 9),
-        '10': Card(Card.CardType.TEN, 10),
-        'k': Card(Card.CardType.KING, 10),
-        'q': Card(Card.CardType.QUEEN, 10),
-        'j': Card(Card.CardType.JACK, 10),
-    }
     code = code.lower()
-    if code not in CODE_TO_CARD:
-        raise ValueError(f"Code has to be one of {', '.join(CODE_TO_CARD.keys())}, got {code}")
-    return CODE_TO_CARD[code]
+    try:
+        return CODE_TO_CARD[code]
+    except KeyError:
+        raise ValueError(f"Code has to be one of {', '.join(CODE_TO_CARD.keys())}, got {code}") from None
 
 
 def make_cards(codes):
@@ -47,8 +51,7 @@ class MockDeck(Deck):
         :param card_codes: A sequence of codes denoting cards that will be drawn from the deck.
                            Example: ['a', '2', '4', 'k', ...]
         """
-        super().__init__()
-        self.cards = make_cards(reversed(card_codes))
+        super().__init__(cards=make_cards(reversed(card_codes)))
 
 GAME_TESTS = [
     {
@@ -103,6 +106,50 @@ GAME_TESTS = [
             "p1": "LOST",
             "p2": "LOST",
         }
+    },
+    {
+        # p1 (A, A, 10 = 12) should not go bust and should lose against dealer (17)
+        "players": ['p1'],
+        "cards": [
+            'a', 'a',
+            '10', '7',
+            '10',
+        ],
+        "moves": {
+            "p1": ['h', 's'],
+        },
+        "results": {
+            "p1": "LOST",
+        }
+    },
+    {
+        # p1 (blackjack) should win against dealer (21 with three cards)
+        "players": ['p1'],
+        "cards": [
+            'a', 'k',
+            '5', '6',
+            '10',
+        ],
+        "moves": {
+            "p1": ['s'],
+        },
+        "results": {
+            "p1": "WON",
+        }
+    },
+    {
+        # p1 (17) should push against dealer (17)
+        "players": ['p1'],
+        "cards": [
+            '10', '7',
+            'k', '7',
+        ],
+        "moves": {
+            "p1": ['s'],
+        },
+        "results": {
+            "p1": "PUSH",
+        }
     }
 ]
 
@@ -139,14 +186,23 @@ class BlackjackTestCase(TestCase):
         game_state = bj.get_game_state()
         # Check each player got the right cards
         for i, player in enumerate(players):
-            self.assertListEqual(game_state['players'][player]['hand'], make_cards(cards[i*2:i*2+2]))
+            self.assertListEqual(game_state.players[player].hand, make_cards(cards[i*2:i*2+2]))
         # Check that the dealer got the right cards
-        self.assertEqual(game_state['dealer']['hand'], make_cards(cards[len(players) * 2: len(players) * 2 + 2]))
+        self.assertEqual(game_state.dealer.hand, make_cards(cards[len(players) * 2: len(players) * 2 + 2]))
+
+    def test_game_state_to_dict(self):
+        bj = self._run_game(players=['p1'], cards=['a', '2', 'k', '8', '9'], moves={'p1': ['h']})
+        self.assertEqual(bj.get_game_state().to_dict(), {
+            'finished': False,
+            'current_player': 'p1',
+            'players': {'p1': {'hand': make_cards(['a', '2', '9']), 'bust': False}},
+            'dealer': {'hand': make_cards(['k', '8']), 'bust': False},
+        })
 
     def _test_blackjack(self, players, cards, moves, results):
         bj = self._run_game(players=players, cards=cards, moves=moves)
         game_state = bj.get_game_state()
-        self.assertTrue(game_state['finished'], msg=f'Game has not finished. Game state:\n{pformat(game_state)}')
+        self.assertTrue(game_state.finished, msg=f'Game has not finished. Game state:\n{pformat(game_state)}')
         game_results = bj.get_game_result()
         for player, expected_result in results.items():
             actual_result = game_results[player]
@@ -164,6 +220,100 @@ class BlackjackTestCase(TestCase):
                 print(f"FAILED:\n{pformat(game)}")
                 raise
 
+    def test_deck_draws(self):
+        deck = MockDeck(['a', '2', '3', '4'])
+        self.assertEqual(len(deck), 4)
+        self.assertEqual(deck.draw_card(), make_card('a'))
+        self.assertListEqual(deck.draw_cards(2), make_cards(['2', '3']))
+        self.assertEqual(len(deck), 1)
+        self.assertEqual(deck.rank_counts()[make_card('4').rank], 1)
+        self.assertEqual(sum(deck.rank_counts()), 1)
+        self.assertRaises(ValueError, deck.draw_cards, -1)
+        self.assertEqual(len(deck), 1)
+        deck.draw_card()
+        self.assertRaises(IndexError, deck.draw_card)
+
+    def test_deck_cards_assigned_after_construction(self):
+        class StackedDeck(Deck):
+            def __init__(self, cards):
+                super().__init__()
+                self.cards = cards
+
+        deck = StackedDeck(make_cards(['k', 'a']))
+        self.assertEqual(len(deck), 2)
+        self.assertListEqual(deck.cards, make_cards(['k', 'a']))
+        self.assertEqual(deck.draw_card(), make_card('a'))
+        self.assertListEqual(deck.cards, make_cards(['k']))
+        self.assertEqual(deck.draw_card(), make_card('k'))
+        self.assertRaises(IndexError, deck.draw_card)
+
+    def test_card_value_must_match_type(self):
+        self.assertEqual(Card(Card.CardType.KING, 10).value, 10)
+        self.assertRaises(ValueError, Card, Card.CardType.KING, 3)
+        self.assertRaises(ValueError, Card, Card.CardType.ACE, 11)
+
+    def test_sum_many_hands(self):
+        hands = [
+            [card.rank for card in make_cards(['a', 'k'])],
+            bytes(card.rank for card in make_cards(['a', 'a', '10'])),
+            tuple(card.rank for card in make_cards(['5', '6', 'q', 'j'])),
+        ]
+        self.assertListEqual(sum_many_hands(hands), [21, 12, 31])
+
+    def test_dealer_terminal_distribution(self):
+        ten = make_card('10').rank
+        only_tens = [0] * 13
+        only_tens[ten] = 8
+        self.assertEqual(dealer_terminal_distribution(ten, only_tens), (0.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+
+        deck_counts = Deck(num_decks=8).rank_counts()
+        for code in ['6', '2', '3', '4', '5', '7', '8', '9', 'a', 'k']:
+            upcard = make_card(code).rank
+            # The upcard has already been dealt, so it is not in the shoe any more
+            counts = list(deck_counts)
+            counts[upcard] -= 1
+            distribution = dealer_terminal_distribution(upcard, counts)
+            self.assertAlmostEqual(sum(distribution), 1.0)
+            # Cached by composition, so the same result object is returned
+            self.assertIs(dealer_terminal_distribution(upcard, counts), distribution)
+            if code == '6':
+                # Dealer showing a 6 busts about 42% of the time from a full 8 deck shoe
+                self.assertAlmostEqual(distribution[-1], 0.422, places=3)
+
+    def test_simulate_games(self):
+        results = simulate_games(200, num_players=3)
+        self.assertEqual(sum(results.values()), 600)
+        # Two cards are always worth at least 2, so players standing on 1 never hit
+        self.assertEqual(simulate_games(200, player_stands_on=1)['BUST'], 0)
+        # 14 hands need 28 cards for the initial deal, more than the 26 in 2 decks
+        self.assertRaises(IndexError, simulate_games, 1, num_players=13)
+
+    def test_simulate_games_matches_blackjack(self):
+        """
+        With the same shuffle, a simulated game gives the same results as a BlackJack game
+        where every player hits below 17.
+        """
+        players = ['p1', 'p2', 'p3']
+        state = random.getstate()
+        try:
+            for seed in range(200):
+                random.seed(seed)
+                results = simulate_games(1, num_players=len(players))
+                random.seed(seed)
+                bj = BlackJack(players)
+                while not bj.game_finished():
+                    name = bj.get_current_player_name()
+                    if bj.get_game_state().players[name].total < 17:
+                        bj.hit_current_player()
+                    else:
+                        bj.stand_current_player()
+                expected = dict.fromkeys(results, 0)
+                for result in bj.get_game_result().values():
+                    expected[result] += 1
+                self.assertEqual(results, expected, msg=f'seed {seed}')
+        finally:
+            random.setstate(state)
+
 
 if __name__ == '__main__':
     main()